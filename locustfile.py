@@ -16,15 +16,73 @@ User Types:
 Usage:
     locust --host=http://localhost:8080
     locust --host=http://localhost:8080 --users 50 --spawn-rate 5
+    locust -f locustfile.py --processes -1 --host=http://localhost:8080  # one process per CPU core
 """
 
 import json
 import random
 import time
-from locust import HttpUser, task, between
 
+import gevent
+import orjson
+from gevent import sleep as gsleep
+from locust import between, task
+from locust.contrib.fasthttp import FastHttpUser
 
-class CustomerUser(HttpUser):
+# Constant request parameters, hoisted to module level so tasks don't rebuild them per call
+
+# Realistic product quantities for promotional purchases
+_PRODUCT_QUANTITIES = (1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 15, 20, 25, 30, 50)
+
+# High-quantity bulk purchases
+_HIGH_VALUE_QUANTITIES = (25, 30, 40, 50, 75, 100, 150, 200, 250, 300, 500)
+
+# Flash sale quantities (limited quantities per flash sale)
+_FLASH_QUANTITIES = (1, 2, 3, 4, 5, 6, 8, 10, 12, 15)
+
+# Admin checks multiple timeframes for complete campaign overview
+_CAMPAIGN_TIMEFRAMES = (
+    (0.1, "6 minutes"),     # Very recent activity
+    (1.0, "1 hour"),        # Recent hourly performance
+    (6.0, "6 hours"),       # Daily performance trends
+    (24.0, "24 hours"),     # Daily campaign results
+    (168.0, "1 week"),      # Weekly campaign overview
+)
+
+# Real-time and short-term metrics: 6min to 2 hours
+_REAL_TIME_FRAMES = (0.1, 0.5, 1.0, 2.0)
+
+_DOCUMENTATION_ENDPOINTS = ("/", "/docs", "/redoc")
+
+_REQUIRED_STATS_FIELDS = (
+    "uptime_seconds", "total_buys", "current_time",
+    "server_status", "n_recent_buys", "timeframe_hours",
+)
+
+# Failure messages embed at most this many bytes of the raw body (no text decoding)
+_FAILURE_BODY_BYTES = 256
+
+
+def _body_excerpt(response) -> bytes:
+    """Return a bounded slice of the raw response body for failure messages."""
+    return (response.content or b"")[:_FAILURE_BODY_BYTES]
+
+
+# Timestamp header values only change once per second, so format them once per second
+_TS_CACHE = {"sec": 0, "unix": "", "iso": ""}
+
+
+def _cached_timestamps() -> dict:
+    """Return the timestamp cache, refreshing it when the wall-clock second changes."""
+    now = int(time.time())
+    if now != _TS_CACHE["sec"]:
+        _TS_CACHE["sec"] = now
+        _TS_CACHE["unix"] = str(now)
+        _TS_CACHE["iso"] = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(now))
+    return _TS_CACHE
+
+
+class CustomerUser(FastHttpUser):
     """
     Simulates customers making purchases during e-commerce promotion campaigns.
     
@@ -38,9 +96,20 @@ class CustomerUser(HttpUser):
     
     weight = 20  # High weight - most users should be customers
     wait_time = between(2, 8)  # Realistic time between purchases
+    network_timeout = 10.0
+    connection_timeout = 10.0
+    concurrency = 10  # Persistent keep-alive connections per user (never send "Connection: close")
     
     def on_start(self):
         """Initialize customer session and verify API is healthy."""
+        # Per-user generator avoids contending on the shared module-level instance
+        self._rand = random.Random()
+
+        # Per-user header dicts, built once; tasks only update the timestamp value
+        self._json_headers = {"Content-Type": "application/json"}
+        self._client_time_headers = {**self._json_headers, "x-client-time": ""}
+        self._iso_time_headers = {**self._json_headers, "x-timestamp": ""}
+
         response = self.client.get("/health")
         if response.status_code != 200:
             print(f"⚠️  API health check failed: {response.status_code}")
@@ -54,13 +123,11 @@ class CustomerUser(HttpUser):
         Simulates customers buying products during promotional campaigns.
         """
         # Generate realistic purchase data
-        user_id = random.randint(1000, 50000)  # Customer ID range
-        promotion_id = random.randint(1, 10)   # Limited number of active promotions
-        product_id = random.randint(100, 999)  # Product catalog range
+        user_id = self._rand.randint(1000, 50000)  # Customer ID range
+        promotion_id = self._rand.randint(1, 10)   # Limited number of active promotions
+        product_id = self._rand.randint(100, 999)  # Product catalog range
         
-        # Realistic product quantities for promotional purchases
-        product_quantities = [1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 15, 20, 25, 30, 50]
-        product_quantity = random.choice(product_quantities)
+        product_quantity = self._rand.choice(_PRODUCT_QUANTITIES)
         
         purchase_data = {
             "user_id": user_id,
@@ -70,30 +137,25 @@ class CustomerUser(HttpUser):
         }
         
         # Add timestamp header for accurate analytics (simulating real client)
-        headers = {
-            "Content-Type": "application/json",
-            "x-client-time": str(int(time.time()))  # Unix timestamp
-        }
+        headers = self._client_time_headers
+        headers["x-client-time"] = _cached_timestamps()["unix"]  # Unix timestamp
         
         with self.client.post(
             "/buy",
-            json=purchase_data,
+            data=orjson.dumps(purchase_data),
             headers=headers,
             catch_response=True
         ) as response:
             if response.status_code == 200:
-                try:
-                    data = response.json()
-                    if data.get("success"):
-                        response.success()  # type: ignore
-                        # Optional: Log successful purchase for debugging
-                        # print(f"✅ Purchase: User {user_id}, Quantity {product_quantity}")
-                    else:
-                        response.failure(f"Purchase not successful: {data}")  # type: ignore
-                except json.JSONDecodeError:
-                    response.failure("Invalid JSON response")  # type: ignore
+                # The API flags success with a header, so the JSON body is never decoded here
+                if response.headers.get("X-Result") == "ok":
+                    response.success()  # type: ignore
+                    # Optional: Log successful purchase for debugging
+                    # print(f"✅ Purchase: User {user_id}, Quantity {product_quantity}")
+                else:
+                    response.failure(f"Purchase not successful: {_body_excerpt(response)!r}")  # type: ignore
             else:
-                response.failure(f"HTTP {response.status_code}: {response.text}")  # type: ignore
+                response.failure(f"HTTP {response.status_code}: {_body_excerpt(response)!r}")  # type: ignore
     
     @task(2)
     def high_value_purchase(self):
@@ -102,13 +164,11 @@ class CustomerUser(HttpUser):
         
         Weight: 2 (occasional high-value customers)
         """
-        user_id = random.randint(1000, 50000)
-        promotion_id = random.randint(1, 5)  # Premium promotions
-        product_id = random.randint(800, 999)  # Premium products
+        user_id = self._rand.randint(1000, 50000)
+        promotion_id = self._rand.randint(1, 5)  # Premium promotions
+        product_id = self._rand.randint(800, 999)  # Premium products
         
-        # High-quantity bulk purchases
-        high_value_quantities = [25, 30, 40, 50, 75, 100, 150, 200, 250, 300, 500]
-        product_quantity = random.choice(high_value_quantities)
+        product_quantity = self._rand.choice(_HIGH_VALUE_QUANTITIES)
         
         purchase_data = {
             "user_id": user_id,
@@ -117,15 +177,13 @@ class CustomerUser(HttpUser):
             "product_quantity": product_quantity
         }
         
-        headers = {
-            "Content-Type": "application/json",
-            "x-timestamp": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())  # ISO timestamp
-        }
+        headers = self._iso_time_headers
+        headers["x-timestamp"] = _cached_timestamps()["iso"]  # ISO timestamp
         
-        self.client.post("/buy", json=purchase_data, headers=headers)
+        self.client.post("/buy", data=orjson.dumps(purchase_data), headers=headers)
 
 
-class AdminUser(HttpUser):
+class AdminUser(FastHttpUser):
     """
     Simulates admin users monitoring promotion campaign performance.
     
@@ -137,6 +195,9 @@ class AdminUser(HttpUser):
     
     weight = 1  # Low weight - only a few admin users
     wait_time = between(5, 15)  # Admins check less frequently but more thoroughly
+    network_timeout = 10.0
+    connection_timeout = 10.0
+    concurrency = 10  # Persistent keep-alive connections per user (never send "Connection: close")
     
     def on_start(self):
         """Initialize admin session with comprehensive health check."""
@@ -153,30 +214,16 @@ class AdminUser(HttpUser):
         Weight: 5 (main admin responsibility)
         Checks various timeframes for comprehensive campaign analysis.
         """
-        # Admin checks multiple timeframes for complete campaign overview
-        timeframes = [
-            (0.1, "6 minutes"),     # Very recent activity
-            (1.0, "1 hour"),        # Recent hourly performance  
-            (6.0, "6 hours"),       # Daily performance trends
-            (24.0, "24 hours"),     # Daily campaign results
-            (168.0, "1 week")       # Weekly campaign overview
-        ]
-        
-        for timeframe_hours, description in timeframes:
+        for timeframe_hours, description in _CAMPAIGN_TIMEFRAMES:
             with self.client.get(
                 f"/stats?timeframe_hours={timeframe_hours}",
                 catch_response=True,
-                name=f"/stats?timeframe_hours={timeframe_hours}"
+                name="/stats"
             ) as response:
                 if response.status_code == 200:
                     try:
                         data = response.json()
-                        required_fields = [
-                            "uptime_seconds", "total_buys", "current_time",
-                            "server_status", "n_recent_buys", "timeframe_hours"
-                        ]
-                        
-                        if all(field in data for field in required_fields):
+                        if all(field in data for field in _REQUIRED_STATS_FIELDS):
                             if data["server_status"] == "healthy":
                                 response.success()  # type: ignore
                                 # Optional: Log campaign metrics for admin visibility
@@ -184,15 +231,15 @@ class AdminUser(HttpUser):
                             else:
                                 response.failure(f"Server unhealthy: {data['server_status']}")  # type: ignore
                         else:
-                            missing = [f for f in required_fields if f not in data]
+                            missing = [f for f in _REQUIRED_STATS_FIELDS if f not in data]
                             response.failure(f"Missing analytics fields: {missing}")  # type: ignore
                     except json.JSONDecodeError:
                         response.failure("Invalid JSON response")  # type: ignore
                 else:
-                    response.failure(f"HTTP {response.status_code}: {response.text}")  # type: ignore
+                    response.failure(f"HTTP {response.status_code}: {_body_excerpt(response)!r}")  # type: ignore
             
             # Brief pause between timeframe checks
-            time.sleep(0.3)
+            gsleep(0.3)
     
     @task(4)
     def system_health_monitoring(self):
@@ -224,12 +271,9 @@ class AdminUser(HttpUser):
         Weight: 3 (important for campaign optimization)
         Focuses on short-term metrics for immediate decision making.
         """
-        # Focus on real-time and short-term metrics
-        real_time_frames = [0.1, 0.5, 1.0, 2.0]  # 6min to 2 hours
-        
-        for timeframe in real_time_frames:
-            self.client.get(f"/stats?timeframe_hours={timeframe}")
-            time.sleep(0.2)
+        for timeframe in _REAL_TIME_FRAMES:
+            self.client.get(f"/stats?timeframe_hours={timeframe}", name="/stats")
+            gsleep(0.2)
     
     @task(2)
     def api_documentation_check(self):
@@ -238,15 +282,13 @@ class AdminUser(HttpUser):
         
         Weight: 2 (periodic admin maintenance)
         """
-        documentation_endpoints = ["/", "/docs", "/redoc"]
-        
-        for endpoint in documentation_endpoints:
+        for endpoint in _DOCUMENTATION_ENDPOINTS:
             with self.client.get(endpoint, catch_response=True) as response:
                 if response.status_code == 200:
                     response.success()  # type: ignore
                 else:
                     response.failure(f"Documentation endpoint failed: {endpoint}")  # type: ignore
-            time.sleep(0.5)
+            gsleep(0.5)
     
     @task(1) 
     def campaign_deep_dive(self):
@@ -258,7 +300,7 @@ class AdminUser(HttpUser):
         print(f"🔍 Admin performing campaign deep dive analysis")
         
         # Get comprehensive stats
-        response = self.client.get("/stats?timeframe_hours=24.0")
+        response = self.client.get("/stats?timeframe_hours=24.0", name="/stats")
         if response.status_code == 200:
             try:
                 data = response.json()
@@ -293,32 +335,31 @@ class BurstCustomer(CustomerUser):
     @task
     def flash_sale_purchases(self):
         """Create burst of purchases simulating flash sale traffic."""
-        burst_size = random.randint(3, 6)
-        flash_sale_promotion = random.randint(1, 3)  # Limited flash sale promotions
+        burst_size = self._rand.randint(3, 6)
+        flash_sale_promotion = self._rand.randint(1, 3)  # Limited flash sale promotions
         
-        for i in range(burst_size):
-            user_id = random.randint(10000, 99999)  # Flash sale customer range
-            product_id = random.randint(100, 200)   # Flash sale products
-            
-            # Flash sale quantities (limited quantities per flash sale)
-            flash_quantities = [1, 2, 3, 4, 5, 6, 8, 10, 12, 15]
-            product_quantity = random.choice(flash_quantities)
-            
-            purchase_data = {
-                "user_id": user_id,
-                "promotion_id": flash_sale_promotion,
-                "product_id": product_id,
-                "product_quantity": product_quantity
-            }
-            
-            # Add request start header (simulating load balancer timing)
-            headers = {
-                "Content-Type": "application/json",
-                "x-request-start": str(int(time.time() * 1000))  # Milliseconds
-            }
-            
-            self.client.post("/buy", json=purchase_data, headers=headers)
-            time.sleep(0.05)  # Very brief pause between burst purchases
+        # Draw the whole burst up front instead of per purchase
+        user_ids = self._rand.choices(range(10000, 100000), k=burst_size)  # Flash sale customer range
+        product_ids = self._rand.choices(range(100, 201), k=burst_size)    # Flash sale products
+        product_quantities = self._rand.choices(_FLASH_QUANTITIES, k=burst_size)
+
+        # Add request start header (simulating load balancer timing); the burst arrives at once.
+        # Built fresh per burst since greenlets may outlive the join timeout.
+        headers = {**self._json_headers, "x-request-start": str(int(time.time() * 1000))}  # Milliseconds
+
+        # Only user, product and quantity change within a burst; reuse one payload dict
+        purchase_data = {"promotion_id": flash_sale_promotion}
+        jobs = []
+
+        for user_id, product_id, product_quantity in zip(user_ids, product_ids, product_quantities, strict=True):
+            purchase_data["user_id"] = user_id
+            purchase_data["product_id"] = product_id
+            purchase_data["product_quantity"] = product_quantity
+
+            # Fire the burst concurrently on greenlets (bounded by the user's connection pool)
+            jobs.append(gevent.spawn(self.client.post, "/buy", data=orjson.dumps(purchase_data), headers=headers))
+
+        gevent.joinall(jobs, timeout=5.0)
 
 
 # Configuration classes for different load testing scenarios  
@@ -364,3 +405,11 @@ if __name__ == "__main__":
     print()
     print("   # Headless stress test")
     print("   locust --host=http://localhost:8080 --users 100 --spawn-rate 10 --run-time 300s --headless")
+    print()
+    print("   # One load-generator process per CPU core (replaces manual --master/--worker on one machine)")
+    print("   locust -f locustfile.py --processes -1 --host=http://localhost:8080")
+    print()
+    print("   # Reproducible benchmark preset (CSV output, fixed duration, warm-up excluded with --reset-stats)")
+    print("   locust -f locustfile.py --host=http://localhost:8080 --users 500 --spawn-rate 50 --run-time 5m \\")
+    print("       --headless --csv=out --csv-full-history --only-summary --reset-stats --processes -1 \\")
+    print("       --loglevel WARNING")
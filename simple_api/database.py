@@ -1,32 +1,84 @@
-"""Mocked database implementation using multiprocessing for thread safety."""
+"""
+Database implementations for buy tracking.
 
-import multiprocessing
-from datetime import datetime
-from typing import Any, Dict, List
+MockedDB is the default in-process store guarded by a threading lock; SQLiteDB is an
+optional file-backed store that all worker processes can share.
+"""
 
-from simple_api.models import BuyInformation
+from __future__ import annotations
+
+import array
+import bisect
+import os
+import socket
+import sqlite3
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Union
+
+if TYPE_CHECKING:
+    from simple_api.models import BuyInformation
+
+# Records older than the largest stats timeframe (1 week) are never queried again
+MAX_RETENTION_HOURS = 168.0
+
+# Extra age tolerated before evicting, so eviction runs in occasional batches
+EVICTION_SLACK_SECONDS = 3600.0
+
+# Environment variable selecting the SQLite backend (path to the database file)
+DB_PATH_ENV_VAR = "BUY_DB_PATH"
+
+
+def _pack_ip(ip_address: str) -> Union[bytes, str]:
+    """Pack an IPv4/IPv6 address into 4/16 raw bytes; other values (e.g. 'unknown') are kept as-is."""
+    for family in (socket.AF_INET, socket.AF_INET6):
+        try:
+            return socket.inet_pton(family, ip_address)
+        except OSError:
+            continue
+    return ip_address
+
+
+def _unpack_ip(packed: Union[bytes, str]) -> str:
+    """Inverse of _pack_ip."""
+    if isinstance(packed, str):
+        return packed
+    return socket.inet_ntop(socket.AF_INET if len(packed) == 4 else socket.AF_INET6, packed)
 
 
 class MockedDB:
     """
-    Mocked database using multiprocessing shared objects to simulate external database.
+    Mocked in-memory database to simulate an external database.
+
+    Data lives in plain Python objects owned by the worker process and guarded by a
+    threading lock, avoiding the pickle + IPC round-trip a multiprocessing.Manager
+    proxy pays on every access. Each worker process holds its own independent data.
 
-    Uses multiprocessing.Manager to create shared objects that can be safely accessed
-    across multiple processes/threads with proper locking mechanisms.
+    Buy records are stored column-wise (one sequence per field, aligned by arrival
+    order) so stats queries only touch the compact timestamp arrays.
     """
 
-    def __init__(self):
-        """Initialize the mocked database with shared objects."""
-        self.manager = multiprocessing.Manager()
+    # Calls only touch memory, so they can run directly on the event loop
+    blocking_io: bool = False
 
-        # Shared list to store visit records
-        self.buys = self.manager.list()
+    def __init__(self) -> None:
+        """Initialize the mocked database with in-memory objects."""
+        # Buy record columns in arrival order
+        self.user_ids: List[int] = []
+        self.promotion_ids: List[int] = []
+        self.product_ids: List[int] = []
+        self.product_quantities: List[int] = []
+        self.ip_addresses: List[Union[bytes, str]] = []  # Packed 4/16-byte addresses
+        self.buy_times: array.array = array.array("d")
 
-        # Shared integer to track total visit count
-        self.buy_count = self.manager.Value("i", 0)  # 'i' for integer
+        # Sorted float64 epoch timestamps of the retained buys, for bisect lookups
+        self.timestamps: array.array = array.array("d")
+
+        # Integer to track total buy count
+        self.buy_count: int = 0
 
         # Lock for thread-safe operations
-        self.lock = self.manager.Lock()
+        self.lock: threading.Lock = threading.Lock()
 
     def add_product_buy(self, buy_data: BuyInformation) -> int:
         """
@@ -39,27 +91,67 @@ class MockedDB:
             int: Updated total buy count
         """
         with self.lock:
-            # Create visit record with timestamp
-            buy_record = {
-                "user_id": buy_data.user_id,
-                "promotion_id": buy_data.promotion_id,
-                "product_id": buy_data.product_id,
-                "product_quantity": buy_data.product_quantity,
-                "ip_address": buy_data.ip_address,
-                "timestamp": buy_data.timestamp.isoformat(),
-            }
+            self._append_record(buy_data)
+            self._evict_expired()
+
+            # Increment buy count
+            self.buy_count += buy_data.product_quantity
+
+            return self.buy_count
+
+    def reserve_buy_count(self, product_quantity: int) -> int:
+        """
+        Count a buy whose record will be stored later by store_buys.
+
+        Args:
+            product_quantity: Quantity of products purchased
+
+        Returns:
+            int: Updated total buy count
+        """
+        with self.lock:
+            self.buy_count += product_quantity
+            return self.buy_count
+
+    def store_buys(self, batch: Iterable[BuyInformation]) -> None:
+        """
+        Store a batch of buy records under a single lock acquisition.
+
+        Counts are not updated here; they are taken up front by reserve_buy_count.
+
+        Args:
+            batch: BuyInformation objects to store
+        """
+        with self.lock:
+            for buy_data in batch:
+                self._append_record(buy_data)
+            self._evict_expired()
 
-            # Add to buys list
-            self.buys.append(buy_record)
+    def is_transient_error(self, error: BaseException) -> bool:
+        """Whether a store_buys failure is worth retrying; in-memory writes never are."""
+        return False
 
-            # Increment visit count
-            self.buy_count.value += buy_data.product_quantity
+    def _append_record(self, buy_data: BuyInformation) -> None:
+        """Append one buy record and its timestamp. Caller must hold the lock."""
+        # Timestamp stored as float epoch seconds
+        ts: float = buy_data.timestamp.timestamp()
 
-            return self.buy_count.value
+        self.user_ids.append(buy_data.user_id)
+        self.promotion_ids.append(buy_data.promotion_id)
+        self.product_ids.append(buy_data.product_id)
+        self.product_quantities.append(buy_data.product_quantity)
+        self.ip_addresses.append(_pack_ip(buy_data.ip_address))
+        self.buy_times.append(ts)
+
+        # Keep the timestamp index sorted (client clocks may arrive out of order)
+        if not self.timestamps or ts >= self.timestamps[-1]:
+            self.timestamps.append(ts)
+        else:
+            bisect.insort(self.timestamps, ts)
 
     def get_total_buys(self) -> int:
-        """Get the total number of buys."""
-        return self.buy_count.value
+        """Get the total number of buys (int reads are atomic, no lock needed)."""
+        return self.buy_count
 
     def get_recent_buys(self, hours: float = 1.0) -> int:
         """
@@ -69,22 +161,259 @@ class MockedDB:
             hours: Number of hours to look back (default: 1.0)
 
         Returns:
-            int: Number of recent visits
+            int: Number of recent buys
         """
+        # Lock-free read: writers only grow this array in place (append/insort, each atomic
+        # under the GIL) and eviction swaps in a new array, so a local reference never
+        # shrinks. A buy added concurrently may or may not be counted, which is fine here.
+        timestamps = self.timestamps
+        n_buys: int = len(timestamps)
+
+        # Nothing stored yet (e.g. right after startup)
+        if n_buys == 0:
+            return 0
+
+        cutoff: float = time.time() - hours * 3600.0
+        # Common cases: every buy is outside / inside the window
+        if timestamps[n_buys - 1] < cutoff:
+            return 0
+        if timestamps[0] >= cutoff:
+            return n_buys
+
+        return n_buys - bisect.bisect_left(timestamps, cutoff, 0, n_buys)
+
+    def _evict_expired(self) -> None:
+        """Drop records older than the retention window. Caller must hold the lock."""
+        window_start: float = time.time() - MAX_RETENTION_HOURS * 3600.0
+        if not self.timestamps or self.timestamps[0] >= window_start - EVICTION_SLACK_SECONDS:
+            return
+
+        # Replace rather than delete in place, so lock-free readers keep a consistent array
+        self.timestamps = self.timestamps[bisect.bisect_left(self.timestamps, window_start):]
+
+        # Columns are in arrival order, so drop the expired leading run from each
+        n_expired = 0
+        for ts in self.buy_times:
+            if ts >= window_start:
+                break
+            n_expired += 1
+        for column in self._columns():
+            del column[:n_expired]
+
+    def _columns(self) -> tuple:
+        """Return the buy record columns, in record field order."""
+        return (
+            self.user_ids,
+            self.promotion_ids,
+            self.product_ids,
+            self.product_quantities,
+            self.ip_addresses,
+            self.buy_times,
+        )
+
+    def get_all_buys(self) -> List[Dict[str, Any]]:
+        """Get all retained buy records, rebuilt as dicts (for debugging purposes)."""
+        fields = ("user_id", "promotion_id", "product_id", "product_quantity", "ip_address", "timestamp")
         with self.lock:
-            current_time = datetime.now()
-            recent_count = 0
+            records = [dict(zip(fields, row, strict=True)) for row in zip(*self._columns(), strict=True)]
+        for record in records:
+            record["ip_address"] = _unpack_ip(record["ip_address"])
+        return records
+
+
+class SQLiteDB:
+    """
+    File-backed buy database using SQLite in WAL mode.
+
+    Exposes the same interface as MockedDB. Every worker process opens the same file, so
+    totals and recent-buy counts are consistent across workers and survive restarts. WAL
+    lets readers run concurrently with the single writer, and the index on the timestamp
+    column makes recent-buy counts an index range scan.
+
+    Buys reserved by reserve_buy_count are counted in memory and added to the shared
+    counter in the same transaction as their records when store_buys writes the batch,
+    so the request path never opens a write transaction.
+    """
+
+    # Calls may wait on file I/O or on another process's write lock (busy_timeout),
+    # so callers on the event loop must run them in a worker thread
+    blocking_io: bool = True
+
+    def __init__(self, path: str) -> None:
+        """
+        Open (and create if needed) the SQLite database.
 
-            for buy in self.buys:
-                buy_time = datetime.fromisoformat(buy["timestamp"])
-                time_diff = current_time - buy_time
+        Args:
+            path: Path to the SQLite database file
+        """
+        self.path: str = path
 
-                if time_diff.total_seconds() <= (hours * 3600):
-                    recent_count += 1
+        # Autocommit mode: transactions are opened explicitly where needed
+        self.conn: sqlite3.Connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA busy_timeout = 5000")
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.execute("PRAGMA synchronous = NORMAL")
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS buys (
+                user_id INTEGER NOT NULL,
+                promotion_id INTEGER NOT NULL,
+                product_id INTEGER NOT NULL,
+                product_quantity INTEGER NOT NULL,
+                ip_address TEXT NOT NULL,
+                ts REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_buys_ts ON buys (ts);
+            CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+            INSERT OR IGNORE INTO counters (name, value) VALUES ('buy_count', 0);
+            """
+        )
 
-            return recent_count
+        # The connection is shared by the threads of this process
+        self.lock: threading.Lock = threading.Lock()
+
+        # Shared total as of this process's last commit, plus buys reserved but not yet stored.
+        # Guarded by a separate lock so reserving never waits behind a slow write.
+        self.shared_count: int = self._read_count()
+        self.pending_count: int = 0
+        self.count_lock: threading.Lock = threading.Lock()
+
+    def add_product_buy(self, buy_data: BuyInformation) -> int:
+        """
+        Add a product buy to the database in a single transaction.
+
+        Kept only to match the MockedDB interface; the API stores buys through
+        reserve_buy_count and store_buys.
+
+        Args:
+            buy_data: BuyInformation object containing buy information
+
+        Returns:
+            int: Updated total buy count
+        """
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._insert_buys((buy_data,))
+                total = self._increment_count(buy_data.product_quantity)
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.conn.execute("COMMIT")
+        with self.count_lock:
+            self.shared_count = total
+            return total + self.pending_count
+
+    def reserve_buy_count(self, product_quantity: int) -> int:
+        """
+        Count a buy whose record will be stored later by store_buys, without touching SQLite.
+
+        Args:
+            product_quantity: Quantity of products purchased
+
+        Returns:
+            int: Updated total buy count (other workers' buys as of this process's last commit)
+        """
+        with self.count_lock:
+            self.pending_count += product_quantity
+            return self.shared_count + self.pending_count
+
+    def store_buys(self, batch: Iterable[BuyInformation]) -> None:
+        """
+        Store a batch of buy records and add their quantities to the shared counter in one transaction.
+
+        If the write fails the transaction is rolled back and the batch stays in the pending
+        count: those buys were already acknowledged, so the caller is expected to retry.
+
+        Args:
+            batch: BuyInformation objects previously counted by reserve_buy_count
+        """
+        batch = list(batch)
+        if not batch:
+            return
+        quantity = sum(buy_data.product_quantity for buy_data in batch)
+
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._insert_buys(batch)
+                total = self._increment_count(quantity)
+                self.conn.execute("COMMIT")
+            except BaseException:
+                if self.conn.in_transaction:
+                    self.conn.execute("ROLLBACK")
+                raise
+
+        with self.count_lock:
+            self.pending_count -= quantity
+            self.shared_count = total
+
+    def is_transient_error(self, error: BaseException) -> bool:
+        """Whether a store_buys failure is worth retrying (another connection holds the write lock)."""
+        if not isinstance(error, sqlite3.OperationalError):
+            return False
+        message = str(error)
+        return "locked" in message or "busy" in message
+
+    def _insert_buys(self, batch: Iterable[BuyInformation]) -> None:
+        """Insert buy rows. Caller must hold the lock inside a transaction."""
+        self.conn.executemany(
+            "INSERT INTO buys (user_id, promotion_id, product_id, product_quantity, ip_address, ts) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    buy_data.user_id,
+                    buy_data.promotion_id,
+                    buy_data.product_id,
+                    buy_data.product_quantity,
+                    buy_data.ip_address,
+                    buy_data.timestamp.timestamp(),
+                )
+                for buy_data in batch
+            ],
+        )
+
+    def _increment_count(self, product_quantity: int) -> int:
+        """Add to the shared buy counter and return it. Caller must hold the lock inside a transaction."""
+        self.conn.execute("UPDATE counters SET value = value + ? WHERE name = 'buy_count'", (product_quantity,))
+        return self._read_count()
+
+    def _read_count(self) -> int:
+        """Read the shared buy counter. Caller must hold the lock."""
+        return self.conn.execute("SELECT value FROM counters WHERE name = 'buy_count'").fetchone()[0]
+
+    def get_total_buys(self) -> int:
+        """Get the total number of buys across all workers, plus this process's unstored buys."""
+        with self.lock:
+            total = self._read_count()
+        with self.count_lock:
+            return total + self.pending_count
+
+    def get_recent_buys(self, hours: float = 1.0) -> int:
+        """
+        Get the number of buys within the specified number of hours.
+
+        Args:
+            hours: Number of hours to look back (default: 1.0)
+
+        Returns:
+            int: Number of recent buys
+        """
+        cutoff: float = time.time() - hours * 3600.0
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM buys WHERE ts >= ?", (cutoff,)).fetchone()[0]
 
     def get_all_buys(self) -> List[Dict[str, Any]]:
         """Get all buy records (for debugging purposes)."""
         with self.lock:
-            return list(self.buys)
+            rows = self.conn.execute(
+                "SELECT user_id, promotion_id, product_id, product_quantity, ip_address, ts FROM buys ORDER BY rowid"
+            ).fetchall()
+        fields = ("user_id", "promotion_id", "product_id", "product_quantity", "ip_address", "timestamp")
+        return [dict(zip(fields, row, strict=True)) for row in rows]
+
+
+def create_db() -> Union[MockedDB, SQLiteDB]:
+    """Create the SQLiteDB when BUY_DB_PATH is set, otherwise the in-process MockedDB."""
+    path = os.environ.get(DB_PATH_ENV_VAR)
+    return SQLiteDB(path) if path else MockedDB()
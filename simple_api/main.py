@@ -1,14 +1,109 @@
 """Main FastAPI application for tracking purchases in an e-commerce website."""
 
+import asyncio
+import logging
 import time
+from collections import defaultdict
+from contextlib import asynccontextmanager
 from datetime import datetime
+from typing import Any, Callable, TypeVar
 
 from fastapi import Depends, FastAPI, HTTPException, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
 
-from simple_api.database import MockedDB
+from simple_api.database import create_db
 from simple_api.models import StatsRequest, StatsResponse, BuyRequest, BuyResponse, BuyInformation
-from simple_api.utils import extract_client_ip, format_uptime, get_stats_request, get_request_generation_time
+from simple_api.utils import (
+    client_ip_dependency,
+    format_uptime,
+    get_stats_request,
+    request_generation_time_dependency,
+)
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Initialize database (in-process MockedDB, or SQLiteDB shared by all workers when BUY_DB_PATH is set)
+db = create_db()
+
+# Maximum number of buy records written to the database per lock acquisition
+BUY_BATCH_SIZE = 128
+
+# Backoff between retries of a batch that failed with a transient error (e.g. SQLite busy)
+FLUSH_RETRY_INITIAL_DELAY_SECONDS = 0.1
+FLUSH_RETRY_MAX_DELAY_SECONDS = 5.0
+
+# Queued after the last buy on shutdown; the flusher stores everything before it and exits
+_FLUSH_STOP = None
+
+
+async def _run_db(func: Callable[..., T], *args: Any) -> T:
+    """Call a database method, in a worker thread when the backend does blocking I/O."""
+    if db.blocking_io:
+        return await asyncio.to_thread(func, *args)
+    return func(*args)
+
+
+def _read_buy_stats(hours: float) -> tuple[int, int]:
+    """Read the total and recent buy counts (grouped so SQLite needs a single thread hop)."""
+    return db.get_total_buys(), db.get_recent_buys(hours=hours)
+
+
+async def _flush_buys(queue: asyncio.Queue) -> None:
+    """Background task draining queued buys into the database in batches, until _FLUSH_STOP."""
+    while True:
+        item = await queue.get()
+        if item is _FLUSH_STOP:
+            return
+        batch = [item]
+        stop = False
+        while len(batch) < BUY_BATCH_SIZE and not queue.empty():
+            item = queue.get_nowait()
+            if item is _FLUSH_STOP:
+                stop = True
+                break
+            batch.append(item)
+        await _store_batch(batch)
+        if stop:
+            return
+
+
+async def _store_batch(batch: list[BuyInformation]) -> None:
+    """
+    Store one batch of already-acknowledged buys.
+
+    Transient failures (another process holding the SQLite write lock) are retried with
+    exponential backoff until the write succeeds. Other errors won't go away on retry, so
+    the batch is logged and dropped to keep the flusher alive for later buys.
+    """
+    delay = FLUSH_RETRY_INITIAL_DELAY_SECONDS
+    while True:
+        try:
+            await _run_db(db.store_buys, batch)
+            return
+        except Exception as e:
+            if not db.is_transient_error(e):
+                logger.exception("Failed to store a batch of %d buys; dropping it", len(batch))
+                return
+            logger.warning("Storing a batch of %d buys failed (%s); retrying in %.1fs", len(batch), e, delay)
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, FLUSH_RETRY_MAX_DELAY_SECONDS)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Run the buy flusher for the lifetime of the app and let it store every queued buy on shutdown."""
+    app.state.buy_queue = asyncio.Queue()
+    flusher = asyncio.create_task(_flush_buys(app.state.buy_queue))
+    try:
+        yield
+    finally:
+        # Not cancelled: a cancel would interrupt an in-flight write (or retry) mid-batch.
+        # The stop marker goes behind the last queued buy, so everything before it is stored.
+        app.state.buy_queue.put_nowait(_FLUSH_STOP)
+        await flusher
+
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -17,14 +112,25 @@ app = FastAPI(
     version="0.1.0",
     docs_url="/docs",
     redoc_url="/redoc",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
 
-# Initialize mocked database
-db = MockedDB()
+# Header set on successful buys so clients can check the outcome without decoding the body
+RESULT_HEADER = "X-Result"
+_BUY_OK_HEADERS = {RESULT_HEADER: "ok"}
+_BUY_MESSAGE_TEMPLATE = "Buy logged successfully. Total buys: %d"
 
 # Track server start time for uptime calculation
 SERVER_START_TIME = time.time()
 
+# Short-lived /stats cache keyed by timeframe; per-key locks make concurrent identical
+# requests share a single computation (single-flight) instead of each scanning the DB
+STATS_CACHE_TTL_SECONDS = 1.0
+STATS_CACHE_MAX_ENTRIES = 256
+_stats_cache: dict[float, tuple[float, StatsResponse]] = {}
+_stats_locks: defaultdict[float, asyncio.Lock] = defaultdict(asyncio.Lock)
+
 
 @app.get("/", summary="Root endpoint")
 async def root():
@@ -41,13 +147,20 @@ async def root():
 
 
 @app.post("/buy", response_model=BuyResponse, summary="Log a user buy")
-async def log_buy(buy_data: BuyRequest, request: Request) -> BuyResponse:
+async def log_buy(
+    buy_data: BuyRequest,
+    request: Request,
+    client_ip: str = Depends(client_ip_dependency),  # noqa: B008
+    request_generation_time: datetime = Depends(request_generation_time_dependency),  # noqa: B008
+) -> ORJSONResponse:
     """
     Log a user purchase to the website.
 
-    This endpoint accepts user purchase information, stores it in the database,
-    and returns the updated purchase count. The operation is thread-safe using
-    multiprocessing locks to prevent race conditions.
+    This endpoint accepts user purchase information, counts it immediately and
+    queues the record for a background task that writes buys to the database in
+    batches, then returns the updated purchase count. Database operations are
+    thread-safe using a threading lock to prevent race conditions. Successful
+    responses carry an ``X-Result: ok`` header.
 
     Automatically extracts and enriches request data with:
     - Real client IP address (handling proxies and load balancers)
@@ -55,18 +168,15 @@ async def log_buy(buy_data: BuyRequest, request: Request) -> BuyResponse:
 
     Args:
         buy_data: Buy information including user_id, promotion_id, product_id, product_quantity
-        request: FastAPI request object for extracting client info
+        request: FastAPI request object for accessing the write queue
+        client_ip: Real client IP, resolved once per request by FastAPI's dependency cache
+        request_generation_time: Request generation time, resolved once per request likewise
 
     Returns:
-        BuyResponse: Success status, buy count, and timing information
+        ORJSONResponse: BuyResponse-shaped body (success status, buy count, message), built
+        directly from a trusted dict to skip response-model validation
     """
-    
-    # Extract and enhance client information
-    client_ip = extract_client_ip(request)
-    
-    request_generation_time = get_request_generation_time(request)
-
-    buy_information = {
+    buy_information: dict[str, Any] = {
         "user_id": buy_data.user_id,
         "promotion_id": buy_data.promotion_id,
         "product_id": buy_data.product_id,
@@ -75,13 +185,19 @@ async def log_buy(buy_data: BuyRequest, request: Request) -> BuyResponse:
         "timestamp": request_generation_time,
     }
     
-    # Add buy to database (thread-safe operation)
-    total_buys = db.add_product_buy(BuyInformation(**buy_information))
+    # Count the buy now (thread-safe operation) and queue the record for the batched
+    # writer. Fields were already validated by BuyRequest or produced by our own
+    # helpers, so skip a second validation pass.
+    total_buys = db.reserve_buy_count(buy_data.product_quantity)
+    request.app.state.buy_queue.put_nowait(BuyInformation.model_construct(**buy_information))
 
-    return BuyResponse(
-        success=True,
-        buy_count=total_buys,
-        message=f"Buy logged successfully. Total buys: {total_buys}",
+    return ORJSONResponse(
+        {
+            "success": True,
+            "buy_count": total_buys,
+            "message": _BUY_MESSAGE_TEMPLATE % total_buys,
+        },
+        headers=_BUY_OK_HEADERS,
     )
 
 
@@ -92,6 +208,7 @@ async def get_stats(stats_request: StatsRequest = Depends(get_stats_request)) ->
 
     Returns information about server uptime, total visits, current time,
     and other relevant metrics for monitoring the traffic tracker service.
+    Results are cached per timeframe for STATS_CACHE_TTL_SECONDS.
 
     Args:
         stats_request: Request parameters including timeframe for recent visits calculation
@@ -99,26 +216,49 @@ async def get_stats(stats_request: StatsRequest = Depends(get_stats_request)) ->
     Returns:
         StatsResponse: Complete server statistics
     """
-    try:
-        current_time = datetime.now()
-        uptime_seconds = (time.time() - SERVER_START_TIME)
+    key = stats_request.timeframe_hours
+    cached = _stats_cache.get(key)
+    if cached is not None and cached[0] > time.monotonic():
+        return cached[1]
+
+    async with _stats_locks[key]:
+        # Another request may have filled the cache while we waited for the lock
+        cached = _stats_cache.get(key)
+        if cached is not None and cached[0] > time.monotonic():
+            return cached[1]
+
+        try:
+            current_time = datetime.now()
+            uptime_seconds = (time.time() - SERVER_START_TIME)
+
+            # Get buy statistics from database
+            total_buys, n_recent_buys = await _run_db(_read_buy_stats, stats_request.timeframe_hours)
+
+            response = StatsResponse(
+                uptime_seconds=uptime_seconds,
+                uptime_formatted=format_uptime(uptime_seconds),
+                total_buys=total_buys,
+                current_time=current_time.isoformat(),
+                server_status="healthy",
+                n_recent_buys=n_recent_buys,
+                timeframe_hours=stats_request.timeframe_hours,
+            )
+
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Failed to retrieve statistics: {str(e)}") from e
 
-        # Get buy statistics from database
-        total_buys = db.get_total_buys()
-        n_recent_buys = db.get_recent_buys(hours=stats_request.timeframe_hours)
+        _store_stats(key, response)
+        return response
 
-        return StatsResponse(
-            uptime_seconds=uptime_seconds,
-            uptime_formatted=format_uptime(uptime_seconds),
-            total_buys=total_buys,
-            current_time=current_time.isoformat(),
-            server_status="healthy",
-            n_recent_buys=n_recent_buys,
-            timeframe_hours=stats_request.timeframe_hours,
-        )
 
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to retrieve statistics: {str(e)}") from e
+def _store_stats(key: float, response: StatsResponse) -> None:
+    """Cache a stats response, pruning expired entries when the cache grows too large."""
+    now = time.monotonic()
+    if len(_stats_cache) >= STATS_CACHE_MAX_ENTRIES:
+        for expired_key in [k for k, (expires_at, _) in _stats_cache.items() if expires_at <= now and k != key]:
+            del _stats_cache[expired_key]
+            _stats_locks.pop(expired_key, None)
+    _stats_cache[key] = (now + STATS_CACHE_TTL_SECONDS, response)
 
 
 @app.get("/health", summary="Health check endpoint")
@@ -133,9 +273,9 @@ async def health_check() -> dict[str, str | float]:
 
 # Exception handlers
 @app.exception_handler(404)
-async def not_found_handler(request: Request, exc: Exception) -> JSONResponse:
+async def not_found_handler(request: Request, exc: Exception) -> ORJSONResponse:
     """Handle 404 errors with custom response."""
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=404,
         content={
             "error": "Not Found",
@@ -2,11 +2,13 @@
 
 from datetime import datetime
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 
 
 class BuyRequest(BaseModel):
     """Request model for logging a buy"""
+    model_config = ConfigDict(extra="ignore", frozen=True)
+
     user_id: int = Field(..., description="User ID")
     promotion_id: int = Field(..., description="Promotion ID")
     product_id: int = Field(..., description="Product ID")
@@ -15,6 +17,8 @@ class BuyRequest(BaseModel):
 
 class BuyInformation(BaseModel):
     """Internal model for storing buy information"""
+    model_config = ConfigDict(extra="ignore", frozen=True)
+
     user_id: int = Field(..., description="User ID")
     promotion_id: int = Field(..., description="Promotion ID")  
     product_id: int = Field(..., description="Product ID")
@@ -25,6 +29,8 @@ class BuyInformation(BaseModel):
 
 class BuyResponse(BaseModel):
     """Response model for buy logging"""
+    model_config = ConfigDict(extra="ignore", frozen=True)
+
     success: bool = Field(..., description="Whether the buy was logged successfully")
     buy_count: int = Field(..., description="Total number of buys logged")
     message: str = Field(..., description="Response message")
@@ -32,6 +38,7 @@ class BuyResponse(BaseModel):
 
 class StatsRequest(BaseModel):
     """Model for statistics request parameters."""
+    model_config = ConfigDict(extra="ignore", frozen=True)
 
     timeframe_hours: float = Field(
         default=1.0,
@@ -43,6 +50,8 @@ class StatsRequest(BaseModel):
 
 class StatsResponse(BaseModel):
     """Response model for stats endpoint"""
+    model_config = ConfigDict(extra="ignore", frozen=True)
+
     uptime_seconds: float = Field(..., description="Server uptime in seconds")
     uptime_formatted: str = Field(..., description="Formatted uptime string") 
     total_buys: int = Field(..., description="Total number of buys")
@@ -54,6 +63,8 @@ class StatsResponse(BaseModel):
 
 class HealthResponse(BaseModel):
     """Response model for health endpoint"""
+    model_config = ConfigDict(extra="ignore", frozen=True)
+
     status: str = Field(..., description="Health status")
     timestamp: str = Field(..., description="Current timestamp")
     uptime_seconds: float = Field(..., description="Server uptime in seconds")
@@ -61,6 +72,8 @@ class HealthResponse(BaseModel):
 
 class RootResponse(BaseModel):
     """Response model for root endpoint"""
+    model_config = ConfigDict(extra="ignore", frozen=True)
+
     message: str = Field(..., description="Welcome message")
     version: str = Field(..., description="API version")
     endpoints: dict = Field(..., description="Available endpoints")
@@ -1,62 +1,50 @@
 """Server startup script for the Traffic Tracker API."""
 
 import argparse
-import subprocess
+import importlib.util
+import os
 import sys
+from typing import Any
 
 import uvicorn
 
+from simple_api.database import DB_PATH_ENV_VAR
 
-def run_with_fastapi_cli(n_workers: int, dev: bool) -> None:
-    """Run the application using FastAPI CLI."""
-    cmd = [
-        "fastapi",
-        "run",
-        "--workers", str(n_workers),
-        "--port", "8080",
-        "simple_api/main.py"
-    ]
-    
-    if dev:
-        cmd.append("--reload")
-    
-    print("🚀 Starting Traffic Tracker API with FastAPI CLI...")
-    print(f"📍 Server will be available at: http://localhost:8080")
-    print(f"👥 Workers: {n_workers}")
-    print(f"🔄 Development mode (reload): {dev}")
-    print("📖 API Documentation: http://localhost:8080/docs")
-    print("🔄 Interactive API: http://localhost:8080/redoc")
-    print(f"🎯 Command: {' '.join(cmd)}")
-    print()
-    
-    try:
-        subprocess.run(cmd, check=True)
-    except subprocess.CalledProcessError as e:
-        print(f"❌ Error starting server with FastAPI CLI: {e}")
-        sys.exit(1)
-    except FileNotFoundError:
-        print("❌ FastAPI CLI not found. Install it with: pip install 'fastapi[standard]'")
-        sys.exit(1)
+
+# uvloop is not available on Windows; fall back to the default asyncio loop there
+EVENT_LOOP = "uvloop" if importlib.util.find_spec("uvloop") is not None else "asyncio"
 
 
 def run_with_uvicorn(n_workers: int, dev: bool) -> None:
-    """Run the application using uvicorn directly."""
+    """
+    Run the application in-process with uvicorn, using the uvloop event loop (when installed) and httptools parser.
+
+    A single worker without reload is served directly by uvicorn.Server; multiple workers or
+    reload need uvicorn's supervisor processes, which uvicorn.run sets up.
+    """
     print("🚀 Starting Traffic Tracker API with uvicorn...")
     print(f"📍 Server will be available at: http://localhost:8080")
     print(f"👥 Workers: {n_workers}")
     print(f"🔄 Development mode (reload): {dev}")
     print("📖 API Documentation: http://localhost:8080/docs")
     print("🔄 Interactive API: http://localhost:8080/redoc")
+    print(f"⚡ Event loop: {EVENT_LOOP}, HTTP parser: httptools")
     print()
 
-    uvicorn.run(
-        "simple_api.main:app",
-        host="0.0.0.0",
-        port=8080,
-        reload=dev,
-        log_level="info",
-        workers=n_workers
-    )
+    options: dict[str, Any] = {
+        "host": "0.0.0.0",
+        "port": 8080,
+        "reload": dev,
+        "log_level": "info",
+        "workers": n_workers,
+        "loop": EVENT_LOOP,
+        "http": "httptools",
+    }
+
+    if n_workers == 1 and not dev:
+        uvicorn.Server(uvicorn.Config("simple_api.main:app", **options)).run()
+    else:
+        uvicorn.run("simple_api.main:app", **options)
 
 
 def main() -> None:
@@ -70,8 +58,7 @@ Examples:
   python run.py --dev                     # Development mode with reload (1 worker)
   python run.py --n-workers 8            # 8 workers, dev mode off
   python run.py --dev --n-workers 1      # Development mode with explicit 1 worker
-  python run.py --fastapi-cli             # Use FastAPI CLI instead of uvicorn
-  python run.py --fastapi-cli --dev       # FastAPI CLI with reload (1 worker)
+  python run.py --fastapi-cli             # Deprecated alias, same as the default uvicorn runner
         """
     )
     
@@ -91,7 +78,7 @@ Examples:
     parser.add_argument(
         "--fastapi-cli",
         action="store_true",
-        help="Use FastAPI CLI instead of uvicorn directly"
+        help="Deprecated: kept for compatibility, runs the same in-process uvicorn server as the default"
     )
     
     args = parser.parse_args()
@@ -116,10 +103,21 @@ Examples:
             f"   4. For production with multiple workers: --n-workers {args.n_workers} (no --dev flag)"
         )
     
-    if args.fastapi_cli:
-        run_with_fastapi_cli(args.n_workers, args.dev)
-    else:
-        run_with_uvicorn(args.n_workers, args.dev)
+    # Outside dev mode, restart under `python -O` so the server (and the workers it spawns,
+    # which inherit interpreter flags) runs with asserts stripped
+    if not args.dev and not sys.flags.optimize:
+        os.execv(sys.executable, [sys.executable, "-O", *sys.orig_argv[1:]])
+
+    # The mocked DB lives inside each worker process, so stats are not aggregated across workers
+    if args.n_workers > 1 and not os.environ.get(DB_PATH_ENV_VAR):
+        print(
+            f"⚠️  Running {args.n_workers} workers: each worker keeps its own in-memory MockedDB, so /buy counts\n"
+            f"   and /stats reflect only the worker that served the request. Use --n-workers 1 for exact totals,\n"
+            f"   or set {DB_PATH_ENV_VAR} to share a SQLite database across workers.\n"
+        )
+
+    # --fastapi-cli used to spawn a `fastapi run` subprocess; uvicorn now always runs in-process
+    run_with_uvicorn(args.n_workers, args.dev)
 
 
 if __name__ == "__main__":
@@ -4,25 +4,74 @@ Utility functions for the Traffic Tracker API.
 This module contains helper functions for IP extraction, formatting,
 and request validation.
 """
+from collections.abc import Callable
 from datetime import datetime
+from functools import lru_cache
+
 from fastapi import HTTPException, Request
 
 from simple_api.models import StatsRequest
 
-def get_stats_request(timeframe_hours: float = 1.0) -> StatsRequest:
-    """Dependency to create StatsRequest from query parameters with validation."""
+# Bound once so the per-header parsing loops skip the attribute lookups on datetime
+_fromiso = datetime.fromisoformat
+_fromts = datetime.fromtimestamp
+_now = datetime.now
+
+# Headers to check in order of preference for real client IP (lowercase bytes, as in the raw ASGI scope)
+_IP_HEADERS = (
+    b"x-forwarded-for",     # Most common proxy header
+    b"x-real-ip",           # Nginx proxy header
+    b"cf-connecting-ip",    # Cloudflare
+    b"x-client-ip",         # Alternative client IP header
+    b"x-forwarded",         # Less common
+    b"forwarded-for",       # Alternative forwarded header
+    b"forwarded",           # RFC 7239 standard
+)
+_IP_HEADER_SET = frozenset(_IP_HEADERS)
+
+# Private/local address prefixes: loopback, 10/8, 192.168/16 and link-local 169.254/16
+_PRIVATE_PREFIXES = ("127.", "10.", "192.168.", "169.254.")
+
+# Exact values treated as private/local
+_PRIVATE_EXACT = frozenset(("localhost", "::1", "0.0.0.0", ""))
+
+# Validated StatsRequest for the default timeframe, returned for most /stats calls
+_DEFAULT_STATS_REQUEST = StatsRequest(timeframe_hours=1.0)
+
+
+async def get_stats_request(timeframe_hours: float = 1.0) -> StatsRequest:
+    """Dependency to create StatsRequest from query parameters with validation (async, so it runs on the event loop)."""
+    # StatsRequest is frozen, so the validated default instance can be shared across requests
+    if timeframe_hours == 1.0:
+        return _DEFAULT_STATS_REQUEST
     try:
         return StatsRequest(timeframe_hours=timeframe_hours)
     except ValueError as e:
         raise HTTPException(status_code=422, detail=str(e)) from e
 
 
+async def client_ip_dependency(request: Request) -> str:
+    """Dependency resolving the client IP once per request (async, so FastAPI runs it on the event loop)."""
+    return extract_client_ip(request)
+
+
+async def request_generation_time_dependency(request: Request) -> datetime:
+    """Dependency resolving the request generation time once per request (async, like client_ip_dependency)."""
+    return get_request_generation_time(request)
+
+
 def format_uptime(uptime_seconds: float) -> str:
     """Format uptime seconds into human-readable string."""
-    days = int(uptime_seconds // 86400)
-    hours = int((uptime_seconds % 86400) // 3600)
-    minutes = int((uptime_seconds % 3600) // 60)
-    seconds = int(uptime_seconds % 60)
+    return _format_uptime_int(int(uptime_seconds))
+
+
+@lru_cache(maxsize=8)
+def _format_uptime_int(uptime_seconds: int) -> str:
+    """Format whole uptime seconds; memoized since the output only changes once per second."""
+    # Chained divmods share intermediates instead of recomputing each unit from the total
+    minutes, seconds = divmod(uptime_seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    days, hours = divmod(hours, 24)
 
     if days > 0:
         return f"{days}d {hours}h {minutes}m {seconds}s"
@@ -47,33 +96,45 @@ def extract_client_ip(request: Request) -> str:
     Returns:
         str: Client IP address or 'unknown' if not found
     """
-    # Headers to check in order of preference for real client IP
-    ip_headers = [
-        "x-forwarded-for",      # Most common proxy header
-        "x-real-ip",            # Nginx proxy header
-        "cf-connecting-ip",     # Cloudflare
-        "x-client-ip",          # Alternative client IP header
-        "x-forwarded",          # Less common
-        "forwarded-for",        # Alternative forwarded header
-        "forwarded",            # RFC 7239 standard
-    ]
-    
+    # Direct connections carry none of the proxy headers: skip straight to the peer address
+    matched = _match_raw_headers(request, _IP_HEADER_SET)
+    if not matched:
+        return _direct_client_ip(request)
+
     # Check proxy headers first
-    for header in ip_headers:
-        header_value = request.headers.get(header)
+    for header in _IP_HEADERS:
+        header_value = matched.get(header)
         if header_value:
             # Handle comma-separated IPs (x-forwarded-for can have multiple IPs)
-            ip_list = [ip.strip() for ip in header_value.split(',')]
-            for ip in ip_list:
-                # Skip private/local IPs and get the first public IP
+            for ip in header_value.decode("latin-1").split(","):
+                # Skip private/local IPs and get the first public IP, stripping lazily
+                ip = ip.strip()
                 if ip and not _is_private_ip(ip):
                     return ip
     
     # Fallback to direct client IP
+    return _direct_client_ip(request)
+
+
+def _match_raw_headers(request: Request, names: frozenset[bytes]) -> dict[bytes, bytes]:
+    """
+    Collect the wanted headers straight from the raw ASGI header list.
+
+    Skips Starlette's per-lookup header decoding: names are compared as lowercase bytes
+    and values are left undecoded until a caller actually uses them. Like
+    ``request.headers.get``, the first occurrence of a repeated header wins.
+    """
+    matched: dict[bytes, bytes] = {}
+    for name, value in request.scope["headers"]:
+        if name in names and name not in matched:
+            matched[name] = value
+    return matched
+
+
+def _direct_client_ip(request: Request) -> str:
+    """Return the peer address of the connection, or 'unknown' if not available."""
     if request.client and request.client.host:
-        client_ip = request.client.host
-        return client_ip
-    
+        return request.client.host
     return "unknown"
 
 
@@ -87,17 +148,24 @@ def _is_private_ip(ip: str) -> bool:
     Returns:
         bool: True if private IP, False otherwise
     """
-    try:
-        # Simple check for common private IP ranges
-        if ip.startswith(("127.", "10.", "192.168.", "172.")):
-            return True
-        if ip.startswith("169.254."):  # Link-local
-            return True
-        if ip in ("localhost", "::1", "0.0.0.0"):
-            return True
+    if not ip:
+        return True
+
+    # Every private value starts with '1' (127/10/169.254/172/192.168), '0', ':' or 'l',
+    # so most public addresses are rejected on their first character
+    if ip[0] not in "10:l":
         return False
-    except Exception:
-        return True  # If we can't parse it, consider it private for safety
+
+    # Single C-level checks: exact sentinels via frozenset, common ranges via one startswith
+    if ip in _PRIVATE_EXACT or ip.startswith(_PRIVATE_PREFIXES):
+        return True
+
+    # Only 172.16.0.0/12 (second octet 16-31) is private, not all of 172.*
+    if ip.startswith("172."):
+        second_octet = ip.split(".", 2)[1]
+        return second_octet.isdigit() and 16 <= int(second_octet) <= 31
+
+    return False
 
 def get_request_generation_time(request: Request) -> datetime:
     """
@@ -116,68 +184,109 @@ def get_request_generation_time(request: Request) -> datetime:
     Returns:
         datetime: Request generation time (timezone-naive)
     """
-    server_receive_time = datetime.now()  # Always timezone-naive
-    
-    # 1. Check for custom client timestamp headers
-    client_time_headers = [
-        "x-timestamp",           # Custom timestamp header
-        "x-client-time",         # Client-side generation time
-        "x-request-time",        # Request generation time
-        "timestamp",             # Simple timestamp header
-    ]
-    
-    for header in client_time_headers:
-        header_value = request.headers.get(header.lower())
-        if header_value:
-            try:
-                # Try parsing as ISO format first
-                if 'T' in header_value or '-' in header_value:
-                    # Handle timezone-aware timestamps by converting to naive
-                    parsed_time = datetime.fromisoformat(header_value.replace('Z', '+00:00'))
-                    # Convert to naive datetime (remove timezone info)
-                    if parsed_time.tzinfo is not None:
-                        parsed_time = parsed_time.replace(tzinfo=None)
-                    
-                    return parsed_time
-                else:
-                    # Try parsing as Unix timestamp
-                    timestamp = float(header_value)
-                    # Handle both seconds and milliseconds
-                    if timestamp > 1e10:  # Likely milliseconds
-                        timestamp = timestamp / 1000
-                    parsed_time = datetime.fromtimestamp(timestamp)
-                    
-                    return parsed_time
-                    
-            except (ValueError, OSError) as e:
-                continue
-    
-    # 2. Check for infrastructure/proxy timing headers
-    proxy_time_headers = [
-        "x-request-start",       # Nginx, HAProxy (usually milliseconds)
-        "x-queue-start",         # Heroku (usually microseconds)
-        "x-request-received",    # Custom proxy headers
-        "x-forwarded-start",     # Some load balancers
-    ]
-    
-    for header in proxy_time_headers:
-        header_value = request.headers.get(header.lower())
+    # 1./2. Client headers, then infrastructure/proxy headers, in one pass over the dispatch table
+    matched = _match_raw_headers(request, _TIME_HEADER_SET)
+    for header, parse in _TIME_HEADERS:
+        header_value = matched.get(header)
         if header_value:
-            try:
-                timestamp = float(header_value)
-                
-                # Handle different time formats
-                if timestamp > 1e12:  # Likely microseconds
-                    timestamp = timestamp / 1_000_000
-                elif timestamp > 1e10:  # Likely milliseconds
-                    timestamp = timestamp / 1000
-                
-                parsed_time = datetime.fromtimestamp(timestamp)
+            parsed_time = parse(header_value.decode("latin-1"))
+            if parsed_time is not None:
                 return parsed_time
-                
-            except (ValueError, OSError) as e:
-                continue
     
-    # 3. Fall back to server receive time
-    return server_receive_time
-    
\ No newline at end of file
+    # 3. Fall back to server receive time, only taken when no header matched
+    return _now()  # Always timezone-naive
+
+
+@lru_cache(maxsize=1024)
+def _parse_client_timestamp(header_value: str) -> datetime | None:
+    """
+    Parse a client timestamp header (ISO 8601 or Unix seconds/milliseconds).
+
+    Memoized on the raw header string, since load-test clients send the same value for
+    every request within a second; datetimes are immutable, so sharing them is safe.
+
+    Args:
+        header_value: Raw header value
+
+    Returns:
+        datetime | None: Parsed timezone-naive datetime, or None if the value is invalid
+    """
+    try:
+        # ISO dates always have '-' after the 4-digit year (YYYY-...); epoch values never do
+        if len(header_value) >= 5 and header_value[4] == "-":
+            # Python 3.10's fromisoformat rejects a trailing 'Z'; only rewrite when present
+            if header_value.endswith("Z"):
+                header_value = header_value[:-1] + "+00:00"
+            # Handle timezone-aware timestamps by converting to naive
+            parsed_time = _fromiso(header_value)
+            # Convert to naive datetime (remove timezone info)
+            if parsed_time.tzinfo is not None:
+                parsed_time = parsed_time.replace(tzinfo=None)
+
+            return parsed_time
+        elif "-" in header_value:
+            # Not ISO and not a valid Unix timestamp (e.g. "-5"): fall back like a failed parse
+            return None
+        else:
+            # Try parsing as Unix timestamp
+            timestamp = _parse_epoch(header_value)
+            # Handle both seconds and milliseconds
+            if timestamp > 1e10:  # Likely milliseconds
+                timestamp = timestamp / 1000
+            return _fromts(timestamp)
+
+    except (ValueError, OSError):
+        return None
+
+
+def _parse_proxy_timestamp(header_value: str) -> datetime | None:
+    """
+    Parse an infrastructure/proxy timing header (Unix seconds, milliseconds or microseconds).
+
+    Args:
+        header_value: Raw header value
+
+    Returns:
+        datetime | None: Parsed timezone-naive datetime, or None if the value is invalid
+    """
+    try:
+        timestamp = _parse_epoch(header_value)
+
+        # Handle different time formats (current epochs: s ~1.7e9, ms ~1.7e12, µs ~1.7e15)
+        if timestamp > 1e15:  # Likely microseconds
+            timestamp = timestamp / 1_000_000
+        elif timestamp > 1e10:  # Likely milliseconds
+            timestamp = timestamp / 1000
+
+        return _fromts(timestamp)
+
+    except (ValueError, OSError):
+        return None
+
+
+def _parse_epoch(value: str) -> int | float:
+    """
+    Parse a Unix epoch string; callers pick the unit (s, ms, µs) from its magnitude.
+
+    Plain digit strings go through int(), which is cheaper than float(); anything else
+    (signs, fractions, exponents) falls back to float(). Negative values are pre-1970
+    and rejected, so they can't enter the store already past the retention window.
+    """
+    if value.startswith("-"):
+        raise ValueError(f"negative epoch timestamp: {value!r}")
+    return int(value) if value.isdigit() else float(value)
+
+
+# Timing headers in order of preference (lowercase bytes), each paired with its parser:
+# client timestamp headers first, then infrastructure/proxy timing headers
+_TIME_HEADERS: tuple[tuple[bytes, Callable[[str], datetime | None]], ...] = (
+    (b"x-timestamp", _parse_client_timestamp),         # Custom timestamp header
+    (b"x-client-time", _parse_client_timestamp),       # Client-side generation time
+    (b"x-request-time", _parse_client_timestamp),      # Request generation time
+    (b"timestamp", _parse_client_timestamp),           # Simple timestamp header
+    (b"x-request-start", _parse_proxy_timestamp),      # Nginx, HAProxy (usually milliseconds)
+    (b"x-queue-start", _parse_proxy_timestamp),        # Heroku (usually microseconds)
+    (b"x-request-received", _parse_proxy_timestamp),   # Custom proxy headers
+    (b"x-forwarded-start", _parse_proxy_timestamp),    # Some load balancers
+)
+_TIME_HEADER_SET = frozenset(header for header, _ in _TIME_HEADERS)
@@ -17,6 +17,9 @@ import sys
 import time
 import json
 
+# Shared session so the connectivity checks reuse one pooled connection
+_session = requests.Session()
+
 
 def test_api_connectivity(host="http://localhost:8080"):
     """Test basic API connectivity before running Locust."""
@@ -24,7 +27,7 @@ def test_api_connectivity(host="http://localhost:8080"):
     
     try:
         # Test health endpoint
-        response = requests.get(f"{host}/health", timeout=5)
+        response = _session.get(f"{host}/health", timeout=5)
         if response.status_code == 200:
             print("✅ Health endpoint working")
         else:
@@ -43,7 +46,7 @@ def test_api_connectivity(host="http://localhost:8080"):
             "product_id": 999,
             "product_quantity": 3
         }
-        response = requests.post(f"{host}/buy", json=test_purchase, timeout=5)
+        response = _session.post(f"{host}/buy", json=test_purchase, timeout=5)
         if response.status_code == 200:
             print("✅ Buy endpoint working")
             data = response.json()
@@ -57,7 +60,7 @@ def test_api_connectivity(host="http://localhost:8080"):
     
     try:
         # Test stats endpoint
-        response = requests.get(f"{host}/stats", timeout=5)
+        response = _session.get(f"{host}/stats", timeout=5)
         if response.status_code == 200:
             print("✅ Stats endpoint working")
             data = response.json()